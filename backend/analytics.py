@@ -0,0 +1,366 @@
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+ROLLING_WINDOWS = (30, 90)
+LOOKBACK_DAYS   = max(ROLLING_WINDOWS) - 1
+MAX_SERIES_DAYS = 366   # daily series length cap
+MAX_MONTHS      = 120   # month-over-month columns cap
+
+
+def normalize_date(value: Optional[str]) -> Optional[str]:
+    """Validate a YYYY-MM-DD query param; raises ValueError for anything else."""
+    if value is None or value == "":
+        return None
+    return date.fromisoformat(value.strip()).isoformat()
+
+def series_bounds(start_date: Optional[str] = None, end_date: Optional[str] = None) -> Tuple[date, date]:
+    """
+    Output span of the daily series: at most MAX_SERIES_DAYS ending at
+    min(end_date, today). Bounding it here keeps one mistyped transaction
+    date (e.g. 9999-12-31) from producing millions of dense days.
+    """
+    today = date.today()
+    last  = min(date.fromisoformat(end_date), today) if end_date else today
+    first = last - timedelta(days=MAX_SERIES_DAYS - 1)
+    if start_date:
+        first = max(first, date.fromisoformat(start_date))
+    return first, last
+
+# ─── Aggregation Pipeline ─────────────────────────────────────────────────────
+def build_pipeline(user_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                   top_n: int = 10) -> List[dict]:
+    """
+    Single-pass $facet pipeline: every breakdown is reduced inside Mongo, so
+    only a few hundred grouped rows come back instead of the full history.
+    Dates are stored as YYYY-MM-DD strings, so month = first 7 characters.
+
+    The outer match reaches LOOKBACK_DAYS before start_date so the rolling
+    averages have their full window; every other facet trims back to the range,
+    and the daily facet only returns days series_bounds() can use.
+    """
+    first, last = series_bounds(start_date, end_date)
+    daily_span  = {"$gte": (first - timedelta(days=LOOKBACK_DAYS)).isoformat(), "$lte": last.isoformat()}
+
+    match: dict = {"user_id": user_id}
+    in_range: List[dict] = []
+    if start_date or end_date:
+        match["date"] = {}
+        if start_date:
+            lookback = date.fromisoformat(start_date) - timedelta(days=LOOKBACK_DAYS)
+            match["date"]["$gte"] = lookback.isoformat()
+            in_range = [{"$match": {"date": {"$gte": start_date}}}]
+        if end_date:
+            match["date"]["$lte"] = end_date
+
+    return [
+        {"$match": match},
+        {"$facet": {
+            "by_month_category": in_range + [
+                {"$group": {
+                    "_id":    {"month": {"$substrCP": ["$date", 0, 7]}, "category": "$category", "type": "$type"},
+                    "amount": {"$sum": "$amount"},
+                }},
+            ],
+            "by_account": in_range + [
+                {"$group": {
+                    "_id":          "$account_id",
+                    "account_name": {"$last": "$account_name"},
+                    "income":       {"$sum": {"$cond": [{"$eq": ["$type", "income"]}, "$amount", 0]}},
+                    "expense":      {"$sum": {"$cond": [{"$eq": ["$type", "expense"]}, "$amount", 0]}},
+                    "count":        {"$sum": 1},
+                }},
+            ],
+            "daily_expense": [
+                {"$match": {"type": "expense", "date": daily_span}},
+                {"$group": {"_id": {"$substrCP": ["$date", 0, 10]}, "amount": {"$sum": "$amount"}}},
+            ],
+            "top_merchants": in_range + [
+                {"$match": {"type": "expense", "note": {"$nin": ["", None]}}},
+                {"$group": {"_id": "$note", "amount": {"$sum": "$amount"}, "count": {"$sum": 1}}},
+                {"$sort": {"amount": -1}},
+                {"$limit": top_n},
+            ],
+        }},
+    ]
+
+# ─── NumPy Post-processing ────────────────────────────────────────────────────
+def _nan_to_none(arr: np.ndarray) -> list:
+    return [None if np.isnan(x) else round(float(x), 2) for x in arr]
+
+
+def _pct_change(matrix: np.ndarray) -> np.ndarray:
+    """Period-over-period % change along the last axis; first period and zero bases are NaN."""
+    out  = np.full(matrix.shape, np.nan)
+    prev = matrix[..., :-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[..., 1:] = np.where(prev != 0, (matrix[..., 1:] - prev) / prev * 100, np.nan)
+    return out
+
+
+def _rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` days; days before the series starts count as zero spend."""
+    csum = np.concatenate(([0.0], np.cumsum(values)))
+    idx  = np.arange(1, len(values) + 1)
+    lo   = np.maximum(idx - window, 0)
+    return (csum[idx] - csum[lo]) / window
+
+
+def _parse(value, unit: str) -> Optional[np.datetime64]:
+    """Parse a YYYY-MM / YYYY-MM-DD key; None for malformed or impossible dates (e.g. 2024-02-30)."""
+    if not isinstance(value, str) or len(value) != (7 if unit == "M" else 10):
+        return None
+    try:
+        return np.datetime64(value, unit)
+    except ValueError:
+        return None
+
+
+def _month_range(first: np.datetime64, last: np.datetime64) -> List[str]:
+    return [str(m) for m in np.arange(first, last + 1)]
+
+
+def summarize(facets: dict, start_date: Optional[str] = None, end_date: Optional[str] = None) -> dict:
+    """
+    Turn the raw $facet output into chart-ready series. Rows whose date keys
+    don't parse, or fall outside series_bounds() / the MAX_MONTHS window, are
+    skipped rather than failing or bloating the whole report.
+    """
+    first, last = series_bounds(start_date, end_date)
+
+    # ── Month-over-month by category ──────────────────────────────────────────
+    last_month  = np.datetime64(last, "M")
+    first_month = last_month - (MAX_MONTHS - 1)
+    if start_date:
+        first_month = max(first_month, np.datetime64(start_date[:7], "M"))
+    rows = [r for r in facets.get("by_month_category", [])
+            if (m := _parse(r["_id"].get("month"), "M")) is not None and first_month <= m <= last_month]
+    if rows:
+        parsed     = [_parse(r["_id"]["month"], "M") for r in rows]
+        months     = _month_range(min(parsed), max(parsed))
+        month_idx  = {m: i for i, m in enumerate(months)}
+        categories = sorted({r["_id"]["category"] for r in rows if r["_id"]["type"] == "expense"})
+        cat_idx    = {c: i for i, c in enumerate(categories)}
+
+        by_cat = np.zeros((len(categories), len(months)))
+        totals = np.zeros((2, len(months)))  # 0 = income, 1 = expense
+        for r in rows:
+            m = month_idx[r["_id"]["month"]]
+            if r["_id"]["type"] == "expense":
+                by_cat[cat_idx[r["_id"]["category"]], m] += r["amount"]
+                totals[1, m] += r["amount"]
+            else:
+                totals[0, m] += r["amount"]
+
+        cat_change   = _pct_change(by_cat)
+        total_change = _pct_change(totals)
+        order        = np.argsort(-by_cat.sum(axis=1))
+        monthly_by_category = {
+            "months":     months,
+            "categories": [
+                {
+                    "category":   categories[i],
+                    "amounts":    _nan_to_none(by_cat[i]),
+                    "change_pct": _nan_to_none(cat_change[i]),
+                    "total":      round(float(by_cat[i].sum()), 2),
+                }
+                for i in order
+            ],
+        }
+        monthly_totals = {
+            "months":             months,
+            "income":             _nan_to_none(totals[0]),
+            "expense":            _nan_to_none(totals[1]),
+            "net":                _nan_to_none(totals[0] - totals[1]),
+            "income_change_pct":  _nan_to_none(total_change[0]),
+            "expense_change_pct": _nan_to_none(total_change[1]),
+        }
+    else:
+        monthly_by_category = {"months": [], "categories": []}
+        monthly_totals      = {"months": [], "income": [], "expense": [], "net": [],
+                               "income_change_pct": [], "expense_change_pct": []}
+
+    # ── Per-account cash flow ─────────────────────────────────────────────────
+    cash_flow_by_account = sorted(
+        (
+            {
+                "account_id":   a["_id"],
+                "account_name": a.get("account_name"),
+                "income":       round(a["income"], 2),
+                "expense":      round(a["expense"], 2),
+                "net":          round(a["income"] - a["expense"], 2),
+                "count":        a["count"],
+            }
+            for a in facets.get("by_account", [])
+        ),
+        key=lambda a: a["expense"] + a["income"],
+        reverse=True,
+    )
+
+    # ── Rolling daily expense averages ────────────────────────────────────────
+    # Fixed-size dense array over [first - LOOKBACK_DAYS, last]; the lookback
+    # only feeds the windows and is trimmed from the output
+    lo = np.datetime64(first - timedelta(days=LOOKBACK_DAYS), "D")
+    hi = np.datetime64(last, "D")
+    daily_rows = [(day, d["amount"]) for d in facets.get("daily_expense", [])
+                  if (day := _parse(d["_id"], "D")) is not None and lo <= day <= hi]
+    if daily_rows and first <= last:
+        days_arr = np.array([day for day, _ in daily_rows], dtype="datetime64[D]")
+        days     = np.arange(lo, hi + 1)
+        daily    = np.zeros(len(days))
+        np.add.at(daily, (days_arr - lo).astype(int), np.array([amount for _, amount in daily_rows], dtype=float))
+
+        averages = {f"avg_{w}d": _rolling_mean(daily, w) for w in ROLLING_WINDOWS}
+        keep     = days >= np.datetime64(first, "D")
+        rolling_expense = {
+            "dates": [str(d) for d in days[keep]],
+            "daily": _nan_to_none(daily[keep]),
+            **{name: _nan_to_none(avg[keep]) for name, avg in averages.items()},
+        }
+    else:
+        rolling_expense = {"dates": [], "daily": [], **{f"avg_{w}d": [] for w in ROLLING_WINDOWS}}
+
+    top_merchants = [
+        {"note": m["_id"], "amount": round(m["amount"], 2), "count": m["count"]}
+        for m in facets.get("top_merchants", [])
+    ]
+
+    return {
+        "monthly_by_category":  monthly_by_category,
+        "monthly_totals":       monthly_totals,
+        "cash_flow_by_account": cash_flow_by_account,
+        "rolling_expense":      rolling_expense,
+        "top_merchants":        top_merchants,
+    }
+
+# ─── Per-user Cache ───────────────────────────────────────────────────────────
+class AnalyticsCache:
+    """
+    In-process LRU + TTL cache keyed by user. A transaction write bumps that
+    user's generation: older entries stop matching, and a report computed
+    before the write is never stored after it.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1024):
+        self.ttl         = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Tuple[float, int, dict]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    def generation(self, user_id: str) -> int:
+        return self._generations.get(user_id, 0)
+
+    def get(self, user_id: str, key: Tuple) -> Optional[dict]:
+        hit = self._entries.get((user_id, key))
+        if hit is None:
+            return None
+        expires, generation, value = hit
+        if expires < time.monotonic() or generation != self.generation(user_id):
+            del self._entries[(user_id, key)]
+            return None
+        self._entries.move_to_end((user_id, key))
+        return value
+
+    def set(self, user_id: str, key: Tuple, value: dict, generation: Optional[int] = None):
+        """Store `value`; skipped if the user was invalidated since `generation` was read."""
+        current = self.generation(user_id)
+        if generation is not None and generation != current:
+            return
+        self._entries[(user_id, key)] = (time.monotonic() + self.ttl, current, value)
+        self._entries.move_to_end((user_id, key))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: str):
+        self._generations[user_id] = self.generation(user_id) + 1
+
+
+async def fetch_spending_facets(collection, user_id: str, start_date: Optional[str] = None,
+                                end_date: Optional[str] = None, top_n: int = 10) -> dict:
+    """Run the facet pipeline against `collection`; dates must already be normalized."""
+    pipeline = build_pipeline(user_id, start_date, end_date, top_n)
+    result   = await collection.aggregate(pipeline, allowDiskUse=True).to_list(1)
+    return result[0] if result else {}
+
+# ─── Benchmark ────────────────────────────────────────────────────────────────
+async def _benchmark(mongo_url: str, n: int, repeats: int):
+    """Seed one user with `n` synthetic transactions and time the analytics path."""
+    import random
+    from collections import defaultdict
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(mongo_url)
+    db     = client["financehub_bench"]
+    coll   = db.transactions
+    await coll.drop()
+    await coll.create_index([("user_id", 1), ("date", 1)])
+
+    rng        = random.Random(0)
+    categories = ["Food & Dining", "Transportation", "Shopping", "Bills & Utilities",
+                  "Entertainment", "Healthcare", "Education", "Salary", "Freelance"]
+    notes      = [f"Merchant {i}" for i in range(500)] + [""]
+    start      = date(2018, 1, 1)
+    docs = []
+    for i in range(n):
+        cat = rng.choice(categories)
+        acc = rng.randrange(5)
+        docs.append({
+            "id":           str(i),
+            "user_id":      "bench-user",
+            "type":         "income" if cat in ("Salary", "Freelance") else "expense",
+            "amount":       round(rng.uniform(1, 500), 2),
+            "category":     cat,
+            "account_id":   f"acc_{acc}",
+            "account_name": f"Account {acc}",
+            "date":         (start + timedelta(days=rng.randrange(365 * 8))).isoformat(),
+            "note":         rng.choice(notes),
+        })
+    for i in range(0, n, 10000):
+        await coll.insert_many(docs[i:i + 10000])
+    del docs
+
+    def timed(label, elapsed):
+        print(f"{label:<32} {elapsed * 1000:9.1f} ms")
+
+    # Baseline: pull everything into Python like get_dashboard_stats does
+    started = time.perf_counter()
+    for _ in range(repeats):
+        rows   = await coll.find({"user_id": "bench-user"}, {"_id": 0}).to_list(None)
+        by_cat = defaultdict(float)
+        for t in rows:
+            if t["type"] == "expense":
+                by_cat[(t["date"][:7], t["category"])] += t["amount"]
+    timed("python full-history scan", (time.perf_counter() - started) / repeats)
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        report = summarize(await fetch_spending_facets(coll, "bench-user"))
+    timed("$facet + numpy", (time.perf_counter() - started) / repeats)
+
+    cache = AnalyticsCache()
+    cache.set("bench-user", (None, None, 10), report)
+    started = time.perf_counter()
+    for _ in range(repeats):
+        cache.get("bench-user", (None, None, 10))
+    timed("cached", (time.perf_counter() - started) / repeats)
+
+    print(f"transactions={n} months={len(report['monthly_totals']['months'])} "
+          f"days={len(report['rolling_expense']['dates'])}")
+    await client.drop_database("financehub_bench")
+    client.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import os
+
+    parser = argparse.ArgumentParser(description="Benchmark spending analytics against a local MongoDB.")
+    parser.add_argument("--mongo-url",    default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--repeats",      type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(_benchmark(args.mongo_url, args.transactions, args.repeats))
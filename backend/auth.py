@@ -65,8 +65,15 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Security(secu
 
     Mock bypass: set AUTH_MODE=mock in env (dev only) or pass token='mock-token'.
     """
-    token = credentials.credentials
+    return decode_token(credentials.credentials)
 
+
+def decode_token(token: str) -> dict:
+    """
+    Verify a raw Firebase ID token (used where no Authorization header is
+    available, e.g. the in-band {"action": "auth"} message on the price stream
+    WebSocket). Raises HTTP 401 on failure.
+    """
     # ── Dev mock bypass ───────────────────────────────────────────────────────
     if os.environ.get('AUTH_MODE') == 'mock' or token == "mock-token":
         return {"uid": "mock-user-id", "email": "demo@example.com"}
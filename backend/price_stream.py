@@ -0,0 +1,423 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+logger = logging.getLogger(__name__)
+
+# ─── Tick Sources ─────────────────────────────────────────────────────────────
+class YFinanceTickSource:
+    """
+    Fetches the latest price and intraday change for all symbols with a single
+    batched yf.download per tick. Bare tickers that return nothing are retried
+    once as <SYMBOL>-USD (same fallback as /api/ai-analysis) and remembered.
+    """
+
+    def __init__(self):
+        self._aliases: Dict[str, str] = {}
+
+    @staticmethod
+    def _quote(frame) -> Optional[dict]:
+        frame = frame.dropna(subset=["Close"]) if "Close" in frame else frame.iloc[0:0]
+        if frame.empty:
+            return None
+        price      = float(frame['Close'].iloc[-1])
+        open_price = float(frame['Open'].iloc[-1])
+        if np.isnan(price) or np.isinf(price):
+            return None
+        change_24h = ((price - open_price) / open_price * 100) if open_price else 0.0
+        if np.isnan(change_24h) or np.isinf(change_24h):
+            change_24h = 0.0
+        return {"price": price, "change_24h": round(change_24h, 2)}
+
+    @classmethod
+    def _quotes_from_frame(cls, df, tickers: List[str]) -> Dict[str, dict]:
+        """Split a group_by="ticker" download into per-ticker quotes."""
+        out: Dict[str, dict] = {}
+        if df is None or df.empty:
+            return out
+        grouped = isinstance(df.columns, pd.MultiIndex)
+        for ticker in tickers:
+            if grouped:
+                if ticker not in df.columns.get_level_values(0):
+                    continue
+                frame = df[ticker]
+            elif len(tickers) == 1:
+                frame = df
+            else:
+                continue
+            quote = cls._quote(frame)
+            if quote is not None:
+                out[ticker] = quote
+        return out
+
+    def _download(self, tickers: List[str]) -> Dict[str, dict]:
+        df = yf.download(tickers, period="5d", interval="1d", group_by="ticker",
+                         progress=False, threads=True, auto_adjust=False)
+        return self._quotes_from_frame(df, tickers)
+
+    def _fetch_sync(self, symbols: List[str]) -> Dict[str, dict]:
+        tickers = {s: self._aliases.get(s, s) for s in symbols}
+        quotes  = self._download(sorted(set(tickers.values())))
+        out     = {s: quotes[t] for s, t in tickers.items() if t in quotes}
+
+        retry = {f"{s}-USD": s for s in symbols if s not in out and "-" not in s and s not in self._aliases}
+        if retry:
+            try:
+                fallback = self._download(sorted(retry))
+            except Exception as exc:
+                logger.error(f"yfinance -USD fallback error: {exc}")
+                fallback = {}
+            for ticker, quote in fallback.items():
+                self._aliases[retry[ticker]] = ticker
+                out[retry[ticker]]           = quote
+        return out
+
+    async def fetch(self, symbols: Iterable[str]) -> Dict[str, dict]:
+        symbols = list(symbols)
+        if not symbols:
+            return {}
+        return await asyncio.to_thread(self._fetch_sync, symbols)
+
+
+class FakeTickSource:
+    """
+    Deterministic random-walk prices, no network. Used for local load tests
+    (PRICE_STREAM_SOURCE=fake) so the hub can be driven by thousands of
+    connections without hitting Yahoo.
+    """
+
+    def __init__(self, seed: int = 42, volatility: float = 0.002, change_probability: float = 0.8):
+        self._rng                = random.Random(seed)
+        self._volatility         = volatility
+        self._change_probability = change_probability
+        self._state: Dict[str, dict] = {}
+        self.calls = 0
+
+    async def fetch(self, symbols: Iterable[str]) -> Dict[str, dict]:
+        self.calls += 1
+        out = {}
+        for symbol in symbols:
+            st = self._state.get(symbol)
+            if st is None:
+                base = self._rng.uniform(1, 1000)
+                st   = self._state[symbol] = {"open": base, "price": base}
+            elif self._rng.random() < self._change_probability:
+                st["price"] *= 1 + self._rng.gauss(0, self._volatility)
+            change_24h = (st["price"] - st["open"]) / st["open"] * 100
+            out[symbol] = {"price": round(st["price"], 4), "change_24h": round(change_24h, 2)}
+        return out
+
+# ─── Subscribers ──────────────────────────────────────────────────────────────
+class Subscriber:
+    """
+    One client connection. Updates are coalesced per symbol: if the consumer
+    falls behind, older pending ticks are overwritten by newer ones, so memory
+    stays bounded by the number of subscribed symbols.
+    """
+
+    def __init__(self):
+        self.symbols: Set[str]         = set()
+        self._pending: Dict[str, dict] = {}
+        self._wake                     = asyncio.Event()
+        self.dropped                   = 0
+
+    def push(self, update: dict):
+        if update["symbol"] in self._pending:
+            self.dropped += 1
+        self._pending[update["symbol"]] = update
+        self._wake.set()
+
+    async def next_batch(self) -> list:
+        """Wait until at least one update is pending, then drain all of them."""
+        await self._wake.wait()
+        self._wake.clear()
+        batch, self._pending = list(self._pending.values()), {}
+        return batch
+
+# ─── Hub ──────────────────────────────────────────────────────────────────────
+class PriceHub:
+    """
+    Polls every distinct subscribed symbol once per tick, regardless of how
+    many subscribers it has, and fans out only the symbols whose price or
+    change actually moved. The shared poll set is capped at `max_symbols`;
+    symbols with no data for `max_misses` consecutive ticks are evicted and
+    their subscribers get a {"status": "unavailable"} update.
+    """
+
+    def __init__(self, source, interval: float = 5.0, max_symbols_per_subscriber: int = 50,
+                 max_symbols: int = 200, max_misses: int = 3):
+        self.source                     = source
+        self.interval                   = interval
+        self.max_symbols_per_subscriber = max_symbols_per_subscriber
+        self.max_symbols                = max_symbols
+        self.max_misses                 = max_misses
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._latest: Dict[str, dict]                 = {}
+        self._misses: Dict[str, int]                  = {}
+        self._task: Optional[asyncio.Task]            = None
+
+    # ── Subscriptions ─────────────────────────────────────────────────────────
+    def subscribe(self, sub: Subscriber, symbols: Iterable[str]) -> list:
+        """
+        Subscribe to symbols; returns the symbols that were actually added.
+        New symbols are refused once the hub already polls `max_symbols`.
+        """
+        added = []
+        for symbol in symbols:
+            if symbol in sub.symbols:
+                continue
+            if len(sub.symbols) >= self.max_symbols_per_subscriber:
+                break
+            if symbol not in self._subscribers and len(self._subscribers) >= self.max_symbols:
+                continue
+            sub.symbols.add(symbol)
+            self._subscribers.setdefault(symbol, set()).add(sub)
+            added.append(symbol)
+            # New subscribers get the last known price straight away
+            if symbol in self._latest:
+                sub.push(self._latest[symbol])
+        return added
+
+    def unsubscribe(self, sub: Subscriber, symbols: Iterable[str]):
+        for symbol in list(symbols):
+            sub.symbols.discard(symbol)
+            subs = self._subscribers.get(symbol)
+            if subs is None:
+                continue
+            subs.discard(sub)
+            if not subs:
+                # Nobody is listening anymore — stop polling it
+                self._drop(symbol)
+
+    def unsubscribe_all(self, sub: Subscriber):
+        self.unsubscribe(sub, list(sub.symbols))
+
+    def _evict(self, symbol: str, now: str) -> int:
+        """Stop polling a symbol with no data and tell its subscribers."""
+        logger.info(f"📡 Evicting {symbol} after {self._misses[symbol]} empty ticks")
+        subs = self._subscribers.get(symbol, set())
+        for sub in subs:
+            sub.symbols.discard(symbol)
+            sub.push({"symbol": symbol, "status": "unavailable", "timestamp": now})
+        self._drop(symbol)
+        return len(subs)
+
+    def _drop(self, symbol: str):
+        self._subscribers.pop(symbol, None)
+        self._latest.pop(symbol, None)
+        self._misses.pop(symbol, None)
+
+    def stats(self) -> dict:
+        return {
+            "symbols":       len(self._subscribers),
+            "subscriptions": sum(len(s) for s in self._subscribers.values()),
+            "running":       self._task is not None and not self._task.done(),
+        }
+
+    # ── Polling ───────────────────────────────────────────────────────────────
+    async def tick(self) -> int:
+        """Poll once and fan out deltas. Returns the number of updates pushed."""
+        symbols = list(self._subscribers)
+        if not symbols:
+            return 0
+
+        quotes = await self.source.fetch(symbols)
+        now    = datetime.now(timezone.utc).isoformat()
+        pushed = 0
+        # An entirely empty batch looks like an upstream outage, not bad symbols
+        if quotes or len(symbols) == 1:
+            for symbol in symbols:
+                if symbol not in self._subscribers:
+                    continue  # Unsubscribed while the fetch was in flight
+                if symbol in quotes:
+                    self._misses.pop(symbol, None)
+                    continue
+                self._misses[symbol] = self._misses.get(symbol, 0) + 1
+                if self._misses[symbol] >= self.max_misses:
+                    pushed += self._evict(symbol, now)
+
+        for symbol, quote in quotes.items():
+            prev = self._latest.get(symbol)
+            if prev and prev["price"] == quote["price"] and prev["change_24h"] == quote["change_24h"]:
+                continue
+            subs = self._subscribers.get(symbol)
+            if not subs:
+                continue  # Unsubscribed while the fetch was in flight
+            update = {"symbol": symbol, **quote, "timestamp": now}
+            self._latest[symbol] = update
+            for sub in subs:
+                sub.push(update)
+            pushed += len(subs)
+        return pushed
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.error(f"Price hub tick failed: {exc}")
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"📡 Price hub started ({type(self.source).__name__}, every {self.interval}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+# ─── Load Test ────────────────────────────────────────────────────────────────
+async def _load_test(connections: int, symbols: int, ticks: int, slow_every: int):
+    """Drive the hub with in-process subscribers fed by FakeTickSource."""
+    source   = FakeTickSource()
+    hub      = PriceHub(source, interval=0)
+    universe = [f"SYM{i}" for i in range(symbols)]
+    rng      = random.Random(0)
+    received = 0
+
+    async def consume(sub: Subscriber, slow: bool):
+        nonlocal received
+        while True:
+            batch = await sub.next_batch()
+            received += len(batch)
+            if slow:
+                await asyncio.sleep(0.05)
+
+    subs, tasks = [], []
+    for i in range(connections):
+        sub = Subscriber()
+        hub.subscribe(sub, rng.sample(universe, min(5, symbols)))
+        subs.append(sub)
+        tasks.append(asyncio.create_task(consume(sub, slow_every and i % slow_every == 0)))
+
+    started = time.perf_counter()
+    pushed  = 0
+    for _ in range(ticks):
+        pushed += await hub.tick()
+        await asyncio.sleep(0)
+    elapsed = time.perf_counter() - started
+
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for sub in subs:
+        hub.unsubscribe_all(sub)
+
+    print(f"connections={connections} symbols={symbols} ticks={ticks}")
+    print(f"upstream fetches={source.calls} (one per tick, independent of connections)")
+    print(f"pushed={pushed} received={received} coalesced={sum(s.dropped for s in subs)}")
+    print(f"elapsed={elapsed:.3f}s  ({pushed / elapsed:,.0f} updates/s)")
+    print(f"hub after cleanup: {hub.stats()}")
+
+
+async def _ws_load_test(url: str, token: str, connections: int, symbols: int, seconds: float, slow_every: int):
+    """
+    Open real WebSocket connections against a running server (start it with
+    PRICE_STREAM_SOURCE=fake and a short PRICE_STREAM_INTERVAL). Every Nth client
+    subscribes to `symbols` symbols on a socket with a tiny receive buffer and
+    stops reading until the last few seconds of the run (with permessage-deflate
+    off, so uncompressed JSON fills the buffers). The server's kernel
+    send buffer (up to tcp_wmem max, 4 MB on Linux) must fill before sends
+    block, so the send-timeout close (1013) only fires when
+    `seconds` x symbols x tick rate x ~110 bytes comfortably exceeds that,
+    e.g. --symbols 50, PRICE_STREAM_INTERVAL=0.02, --seconds 60.
+    Closes are reported per close code; a stalled peer usually sees 1006,
+    because the server's 1013 close frame can't get through the full buffer either.
+    """
+    import json
+    import socket
+    from urllib.parse import urlparse
+
+    import websockets
+
+    universe = [f"SYM{i}" for i in range(max(symbols, 1))]
+    rng      = random.Random(0)
+    counts   = {"connected": 0, "authenticated": 0, "messages": 0, "updates": 0, "failed": 0}
+    closes: Dict[int, int] = {}
+    target   = urlparse(url)
+
+    def slow_socket() -> socket.socket:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.connect((target.hostname, target.port or 80))
+        sock.setblocking(False)
+        return sock
+
+    async def client(i: int):
+        slow = bool(slow_every) and i % slow_every == 0
+        try:
+            # No permessage-deflate for slow clients: compressed JSON fills buffers ~5x slower
+            extra = {"sock": slow_socket(), "max_queue": 1, "compression": None} if slow else {}
+            async with websockets.connect(url, **extra) as ws:
+                counts["connected"] += 1
+                wanted = universe if slow else rng.sample(universe, min(3, len(universe)))
+                await ws.send(json.dumps({"action": "auth", "token": token, "symbols": wanted}))
+                if json.loads(await ws.recv()).get("type") == "authenticated":
+                    counts["authenticated"] += 1
+                if slow:
+                    # Stall, then drain whatever is left to learn how the server closed us
+                    await asyncio.sleep(max(seconds - 5, seconds / 2))
+                async for raw in ws:
+                    msg = json.loads(raw)
+                    counts["messages"] += 1
+                    if msg.get("type") == "prices":
+                        counts["updates"] += len(msg["data"])
+        except websockets.ConnectionClosed:
+            pass
+        except Exception:
+            counts["failed"] += 1
+            return
+        # 1013 if the close frame got through; 1006 if the server gave up on a full buffer
+        if ws.close_code is not None:
+            closes[int(ws.close_code)] = closes.get(int(ws.close_code), 0) + 1
+
+    tasks   = [asyncio.create_task(client(i)) for i in range(connections)]
+    started = time.perf_counter()
+    await asyncio.wait(tasks, timeout=seconds)
+    elapsed = time.perf_counter() - started
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    print(f"url={url} connections={connections} seconds={seconds}")
+    print(", ".join(f"{k}={v}" for k, v in counts.items()))
+    print(f"server closes by code: {closes or 'none'}")
+    print(f"{counts['updates'] / elapsed:,.0f} updates/s received")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Load-test the price stream. Without --url only the in-process hub is measured "
+                    "(no sockets); with --url, real WebSocket clients connect to a running server."
+    )
+    parser.add_argument("--url",         help="e.g. ws://127.0.0.1:8000/api/prices/stream (server with PRICE_STREAM_SOURCE=fake)")
+    parser.add_argument("--token",       default="mock-token", help="ID token sent in the auth message (--url mode)")
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--symbols",     type=int, default=50)
+    parser.add_argument("--ticks",       type=int, default=100, help="hub ticks to run (in-process mode)")
+    parser.add_argument("--seconds",     type=float, default=30, help="how long clients stay connected (--url mode)")
+    parser.add_argument("--slow-every",  type=int, default=10,
+                        help="every Nth subscriber is a slow consumer (0 = none); in --url mode it stops reading")
+    args = parser.parse_args()
+    if args.url:
+        asyncio.run(_ws_load_test(args.url, args.token, args.connections, args.symbols, args.seconds, args.slow_every))
+    else:
+        asyncio.run(_load_test(args.connections, args.symbols, args.ticks, args.slow_every))
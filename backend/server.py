@@ -1,12 +1,14 @@
 import os
+import asyncio
 import logging
 import json
+import re
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import List, Optional
 from collections import defaultdict
 
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -20,7 +22,9 @@ import pandas as pd
 from google import genai
 from google.genai import types
 
-from auth import verify_token
+from auth import verify_token, decode_token
+from price_stream import PriceHub, Subscriber, YFinanceTickSource, FakeTickSource
+from analytics import AnalyticsCache, fetch_spending_facets, normalize_date, summarize
 
 # ─── Environment & Logging ────────────────────────────────────────────────────
 ROOT_DIR = Path(__file__).parent
@@ -44,6 +48,11 @@ db_name   = get_env_var('DB_NAME', 'financehub')
 client = AsyncIOMotorClient(mongo_url)
 db     = client[db_name]
 
+analytics_cache = AnalyticsCache(
+    ttl=float(get_env_var('ANALYTICS_CACHE_TTL', '300')),
+    max_entries=int(get_env_var('ANALYTICS_CACHE_MAX_ENTRIES', '1024')),
+)
+
 # ─── API Keys ─────────────────────────────────────────────────────────────────
 # Mevcut tüm anahtarları logla (güvenlik için değerleri değil sadece isimleri)
 all_keys = sorted(list(os.environ.keys()))
@@ -172,13 +181,16 @@ async def init_default_categories():
 async def startup():
     try:
         await init_default_categories()
+        await db.transactions.create_index([("user_id", 1), ("date", 1)])
         logger.info("✅ Startup complete")
     except Exception as e:
         logger.error(f"⚠️  Startup warning (DB might be down): {e}")
+    price_hub.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await price_hub.stop()
     client.close()
     logger.info("MongoDB connection closed")
 
@@ -269,6 +281,7 @@ async def create_transaction(transaction: TransactionCreate, user_data: dict = D
         {"$set": {"balance": new_balance}}
     )
     await db.transactions.insert_one(transaction_dict)
+    analytics_cache.invalidate(user_id)
     return Transaction(**transaction_dict)
 
 
@@ -312,6 +325,7 @@ async def delete_transaction(transaction_id: str, user_data: dict = Depends(veri
         await db.accounts.update_one({"id": transaction["account_id"]}, {"$set": {"balance": new_balance}})
 
     await db.transactions.delete_one({"id": transaction_id})
+    analytics_cache.invalidate(user_id)
     return {"message": "Transaction deleted successfully"}
 
 # ─── Category Endpoints ───────────────────────────────────────────────────────
@@ -375,6 +389,41 @@ async def get_dashboard_stats(user_data: dict = Depends(verify_token)):
         "balance_history":      balance_history[-30:],
     }
 
+# ─── Spending Analytics ───────────────────────────────────────────────────────
+@api_router.get("/analytics/spending")
+async def get_spending_analytics(
+    start_date: Optional[str] = None,
+    end_date:   Optional[str] = None,
+    top:        int = 10,
+    user_data:  dict = Depends(verify_token)
+):
+    user_id = user_data['uid']
+    try:
+        start_date = normalize_date(start_date)
+        end_date   = normalize_date(end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be valid YYYY-MM-DD values")
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+
+    top = max(1, min(top, 100))
+    key = (start_date, end_date, top)
+
+    cached = analytics_cache.get(user_id, key)
+    if cached is not None:
+        return cached
+
+    generation = analytics_cache.generation(user_id)
+    try:
+        facets = await fetch_spending_facets(db.transactions, user_id, start_date, end_date, top)
+    except Exception as e:
+        logger.error(f"Analytics DB error (returning empty report): {e}")
+        return summarize({})
+
+    report = summarize(facets, start_date, end_date)
+    analytics_cache.set(user_id, key, report, generation=generation)
+    return report
+
 # ─── AI Analysis ──────────────────────────────────────────────────────────────
 CRYPTO_LIST = {
     "BTC", "ETH", "BNB", "SOL", "XRP", "ADA", "AVAX", "DOGE", "DOT", "MATIC", "LINK", "UNI",
@@ -395,6 +444,14 @@ INTERVAL_MAP = {
 }
 
 
+def normalize_symbol(raw: str) -> str:
+    """Upper-case a ticker and auto-append -USD for known crypto tickers."""
+    symbol = raw.upper().strip()
+    if symbol in CRYPTO_LIST:
+        symbol = f"{symbol}-USD"
+    return symbol
+
+
 def clean_float(val):
     if isinstance(val, float) and (np.isnan(val) or np.isinf(val)):
         return None
@@ -403,14 +460,10 @@ def clean_float(val):
 
 @api_router.post("/ai-analysis")
 async def get_ai_analysis(request: AIAnalysisRequest, user_data: dict = Depends(verify_token)):
-    symbol = request.symbol.upper().strip()
+    symbol = normalize_symbol(request.symbol)
     period = request.period
     lang   = request.language
 
-    # Auto-append -USD for known crypto tickers
-    if symbol in CRYPTO_LIST:
-        symbol = f"{symbol}-USD"
-
     # ── 1. Fetch Market Data ──────────────────────────────────────────────────
     yf_interval, yf_period = INTERVAL_MAP.get(period, ("1d", "1mo"))
 
@@ -570,5 +623,142 @@ RULES:
         "timestamp":         datetime.now(timezone.utc).isoformat(),
     }
 
+# ─── Price Stream ─────────────────────────────────────────────────────────────
+# One background hub polls each distinct symbol once per tick and pushes only
+# changed prices to subscribers. PRICE_STREAM_SOURCE=fake uses a local random
+# walk instead of yfinance (for load testing).
+PRICE_STREAM_INTERVAL     = float(get_env_var('PRICE_STREAM_INTERVAL', '5'))
+PRICE_STREAM_SEND_TIMEOUT = float(get_env_var('PRICE_STREAM_SEND_TIMEOUT', '10'))
+PRICE_STREAM_AUTH_TIMEOUT = float(get_env_var('PRICE_STREAM_AUTH_TIMEOUT', '10'))
+PRICE_STREAM_MAX_SYMBOLS  = int(get_env_var('PRICE_STREAM_MAX_SYMBOLS', '200'))
+
+price_hub = PriceHub(
+    FakeTickSource() if get_env_var('PRICE_STREAM_SOURCE').lower() == 'fake' else YFinanceTickSource(),
+    interval=PRICE_STREAM_INTERVAL,
+    max_symbols=PRICE_STREAM_MAX_SYMBOLS,
+)
+
+# Yahoo-style tickers: AAPL, BTC-USD, ^GSPC, EURUSD=X, THYAO.IS
+_SYMBOL_RE = re.compile(r'^[A-Z0-9^][A-Z0-9.\-=^]{0,14}$')
+
+
+def _parse_symbols(raw) -> List[str]:
+    if isinstance(raw, str):
+        raw = raw.split(',')
+    if not isinstance(raw, list):
+        return []
+    return [normalize_symbol(s) for s in raw if isinstance(s, str) and s.strip()]
+
+
+def _subscribe(sub: Subscriber, requested: List[str], kind: str) -> dict:
+    """Subscribe valid symbols; the ack also lists those refused (invalid or over a cap)."""
+    added = price_hub.subscribe(sub, [s for s in requested if _SYMBOL_RE.match(s)])
+    return {
+        "type":     kind,
+        "symbols":  added,
+        "rejected": [s for s in requested if s not in sub.symbols],
+    }
+
+
+async def _receive_message(websocket: WebSocket) -> Optional[dict]:
+    """Read one frame; returns None for anything that isn't a JSON object."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    try:
+        msg = json.loads(message.get("text") or message.get("bytes") or "")
+    except ValueError:
+        return None
+    return msg if isinstance(msg, dict) else None
+
+
+async def _close_quietly(websocket: WebSocket, code: int):
+    # A peer that stopped reading can block the close handshake too
+    try:
+        await asyncio.wait_for(websocket.close(code=code), timeout=PRICE_STREAM_SEND_TIMEOUT)
+    except Exception:
+        pass
+
+
+@api_router.websocket("/prices/stream")
+async def price_stream(websocket: WebSocket):
+    """
+    The first message must be {"action": "auth", "token": "<id token>", "symbols": [...]}.
+    The token is sent in-band rather than as a query param so it never ends up
+    in access logs. Afterwards send {"action": "subscribe" | "unsubscribe", "symbols": [...]}.
+    Acks carry "symbols" (added) and "rejected" (invalid, or over the per-connection
+    or hub-wide symbol cap). Server pushes
+    {"type": "prices", "data": [{symbol, price, change_24h, timestamp}]}; a symbol
+    that keeps returning no data arrives once as {symbol, "status": "unavailable"}
+    and is dropped from the subscription.
+    """
+    await websocket.accept()
+    try:
+        hello = await asyncio.wait_for(_receive_message(websocket), timeout=PRICE_STREAM_AUTH_TIMEOUT)
+        if not hello or hello.get("action") != "auth":
+            raise HTTPException(status_code=401, detail="First message must be an auth action")
+        decode_token(str(hello.get("token") or ""))
+    except WebSocketDisconnect:
+        return
+    except (HTTPException, asyncio.TimeoutError):
+        await _close_quietly(websocket, 1008)
+        return
+
+    sub       = Subscriber()
+    send_lock = asyncio.Lock()
+
+    async def send(payload: dict):
+        # A consumer that can't take a message within the timeout is dropped
+        async with send_lock:
+            await asyncio.wait_for(websocket.send_json(payload), timeout=PRICE_STREAM_SEND_TIMEOUT)
+
+    async def sender():
+        while True:
+            batch = await sub.next_batch()
+            await send({"type": "prices", "data": batch})
+
+    send_task    = asyncio.create_task(sender())
+    receive_task = None
+    close_code   = None
+    try:
+        await send(_subscribe(sub, _parse_symbols(hello.get("symbols")), "authenticated"))
+        while True:
+            receive_task = asyncio.create_task(_receive_message(websocket))
+            done, _ = await asyncio.wait({receive_task, send_task}, return_when=asyncio.FIRST_COMPLETED)
+            if send_task in done:
+                send_task.result()  # Re-raise the send error / timeout
+                break
+
+            msg = receive_task.result()
+            if msg is None:
+                await send({"type": "error", "detail": "Messages must be JSON objects"})
+                continue
+
+            action = msg.get("action")
+            wanted = _parse_symbols(msg.get("symbols"))
+            if action == "subscribe":
+                await send(_subscribe(sub, wanted, "subscribed"))
+            elif action == "unsubscribe":
+                price_hub.unsubscribe(sub, wanted)
+                await send({"type": "unsubscribed", "symbols": wanted})
+            else:
+                await send({"type": "error", "detail": "Unknown action"})
+    except WebSocketDisconnect:
+        pass
+    except asyncio.TimeoutError:
+        logger.warning("Price stream consumer too slow — closing connection")
+        close_code = 1013
+    except Exception as e:
+        logger.error(f"Price stream error: {e}")
+        close_code = 1011
+    finally:
+        send_task.cancel()
+        if receive_task is not None:
+            receive_task.cancel()
+        price_hub.unsubscribe_all(sub)
+
+    if close_code is not None:
+        await _close_quietly(websocket, close_code)
+
 # ─── Register Router ──────────────────────────────────────────────────────────
 app.include_router(api_router)
\ No newline at end of file
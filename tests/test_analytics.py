@@ -0,0 +1,184 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from analytics import (
+    AnalyticsCache,
+    LOOKBACK_DAYS,
+    MAX_MONTHS,
+    MAX_SERIES_DAYS,
+    _pct_change,
+    _rolling_mean,
+    build_pipeline,
+    normalize_date,
+    series_bounds,
+    summarize,
+)
+
+
+def month_row(month, category, amount, type_="expense"):
+    return {"_id": {"month": month, "category": category, "type": type_}, "amount": amount}
+
+
+def test_pct_change_first_period_and_zero_base_are_nan():
+    out = _pct_change(np.array([[100.0, 150.0, 0.0, 50.0]]))
+    assert np.isnan(out[0, 0])
+    assert out[0, 1] == pytest.approx(50.0)
+    assert out[0, 2] == pytest.approx(-100.0)
+    assert np.isnan(out[0, 3])
+
+
+def test_month_gaps_are_filled_with_zeros():
+    report = summarize({"by_month_category": [
+        month_row("2026-01", "Food", 100.0),
+        month_row("2026-03", "Food", 150.0),
+        month_row("2026-02", "Salary", 5000.0, "income"),
+    ]})
+    by_cat = report["monthly_by_category"]
+    assert by_cat["months"] == ["2026-01", "2026-02", "2026-03"]
+    assert by_cat["categories"][0]["amounts"] == [100.0, 0.0, 150.0]
+    assert by_cat["categories"][0]["change_pct"] == [None, -100.0, None]
+    assert report["monthly_totals"]["net"] == [-100.0, 5000.0, -150.0]
+
+
+def test_rolling_mean_divides_by_full_window():
+    assert list(_rolling_mean(np.array([90.0, 0.0, 0.0]), 90)) == pytest.approx([1.0, 1.0, 1.0])
+    assert list(_rolling_mean(np.array([1.0, 2.0, 3.0, 4.0]), 2)) == pytest.approx([0.5, 1.5, 2.5, 3.5])
+
+
+def test_single_expense_is_spread_over_the_window_and_decays():
+    report = summarize({"daily_expense": [{"_id": "2024-03-01", "amount": 90.0}]},
+                       start_date="2024-03-01", end_date="2024-03-31")
+    rolling = report["rolling_expense"]
+    assert rolling["dates"][0] == "2024-03-01"
+    assert rolling["dates"][-1] == "2024-03-31"
+    assert rolling["avg_90d"][0] == 1.0
+    assert rolling["avg_30d"][0] == 3.0
+    assert rolling["avg_30d"][-1] == 0.0  # the 2024-03-01 expense left the 30-day window
+
+
+def test_series_extends_to_today_without_end_date():
+    old = (date.today() - timedelta(days=200)).isoformat()
+    rolling = summarize({"daily_expense": [{"_id": old, "amount": 50.0}]})["rolling_expense"]
+    assert rolling["dates"][-1] == date.today().isoformat()
+    assert rolling["avg_30d"][-1] == 0.0
+
+
+def test_lookback_feeds_window_but_is_trimmed_from_output():
+    facets = {"daily_expense": [
+        {"_id": "2024-02-20", "amount": 300.0},  # lookback, before start_date
+        {"_id": "2024-03-01", "amount": 30.0},
+    ]}
+    rolling = summarize(facets, start_date="2024-03-01", end_date="2024-03-02")["rolling_expense"]
+    assert rolling["dates"] == ["2024-03-01", "2024-03-02"]
+    assert rolling["daily"] == [30.0, 0.0]
+    assert rolling["avg_30d"] == [11.0, 11.0]
+
+
+def test_pipeline_looks_back_for_daily_facet_only():
+    pipeline = build_pipeline("u", start_date="2024-03-31", end_date="2024-04-30")
+    lookback = (date(2024, 3, 31) - timedelta(days=LOOKBACK_DAYS)).isoformat()
+    assert pipeline[0]["$match"]["date"] == {"$gte": lookback, "$lte": "2024-04-30"}
+
+    facets = pipeline[1]["$facet"]
+    for name in ("by_month_category", "by_account", "top_merchants"):
+        assert facets[name][0] == {"$match": {"date": {"$gte": "2024-03-31"}}}
+    daily_from = (date(2024, 3, 31) - timedelta(days=LOOKBACK_DAYS)).isoformat()
+    assert facets["daily_expense"][0] == {"$match": {"type": "expense", "date": {"$gte": daily_from, "$lte": "2024-04-30"}}}
+
+
+def test_impossible_dates_are_skipped_instead_of_failing():
+    report = summarize({
+        "by_month_category": [month_row("2024-13", "Food", 1.0), month_row("2024-02", "Food", 2.0)],
+        "daily_expense":     [{"_id": "2024-02-30", "amount": 5.0}, {"_id": "2024-02-28", "amount": 3.0}],
+    }, start_date="2024-02-28", end_date="2024-02-29")
+    assert report["monthly_by_category"]["months"] == ["2024-02"]
+    assert report["rolling_expense"]["dates"] == ["2024-02-28", "2024-02-29"]
+    assert report["rolling_expense"]["daily"] == [3.0, 0.0]
+
+
+def test_out_of_range_dates_cannot_blow_up_the_series():
+    today = date.today()
+    facets = {
+        "daily_expense": [
+            {"_id": "0024-01-01", "amount": 1.0},
+            {"_id": (today - timedelta(days=3)).isoformat(), "amount": 30.0},
+            {"_id": "9999-12-31", "amount": 1.0},
+        ],
+        "by_month_category": [
+            month_row("0024-01", "Food", 1.0),
+            month_row(today.isoformat()[:7], "Food", 30.0),
+            month_row("9999-12", "Food", 1.0),
+        ],
+    }
+    report = summarize(facets)
+
+    rolling = report["rolling_expense"]
+    assert len(rolling["dates"]) == MAX_SERIES_DAYS
+    assert rolling["dates"][-1] == today.isoformat()
+    assert sum(rolling["daily"]) == 30.0
+    assert report["monthly_by_category"]["months"] == [today.isoformat()[:7]]
+
+
+def test_series_bounds():
+    today = date.today()
+    assert series_bounds() == (today - timedelta(days=MAX_SERIES_DAYS - 1), today)
+    assert series_bounds("2024-01-10", "2024-01-20") == (date(2024, 1, 10), date(2024, 1, 20))
+    assert series_bounds("2000-01-01", "2024-12-31")[0] == date(2024, 12, 31) - timedelta(days=MAX_SERIES_DAYS - 1)
+    assert series_bounds(end_date="9999-12-31")[1] == today
+
+
+def test_month_columns_are_capped():
+    end = date(2024, 12, 31)
+    rows = [month_row(f"{y}-{m:02d}", "Food", 1.0) for y in range(2000, 2025) for m in range(1, 13)]
+    months = summarize({"by_month_category": rows}, end_date=end.isoformat())["monthly_by_category"]["months"]
+    assert len(months) == MAX_MONTHS
+    assert months[-1] == "2024-12"
+
+
+def test_normalize_date():
+    assert normalize_date(None) is None
+    assert normalize_date("") is None
+    assert normalize_date(" 2024-02-29 ") == "2024-02-29"
+    for bad in ("2024-02-30", "yesterday", "2024-2-1x"):
+        with pytest.raises(ValueError):
+            normalize_date(bad)
+
+
+def test_cache_invalidation_drops_entries():
+    cache = AnalyticsCache()
+    cache.set("u", ("k",), {"v": 1})
+    assert cache.get("u", ("k",)) == {"v": 1}
+
+    cache.invalidate("u")
+    assert cache.get("u", ("k",)) is None
+
+
+def test_cache_skips_write_computed_before_invalidation():
+    cache = AnalyticsCache()
+    generation = cache.generation("u")
+    cache.invalidate("u")  # a transaction write lands while the report is computed
+    cache.set("u", ("k",), {"stale": True}, generation=generation)
+    assert cache.get("u", ("k",)) is None
+
+
+def test_cache_is_bounded_lru_and_per_user():
+    cache = AnalyticsCache(max_entries=2)
+    cache.set("u", ("a",), {"v": "a"})
+    cache.set("u", ("b",), {"v": "b"})
+    cache.get("u", ("a",))
+    cache.set("other", ("a",), {"v": "other"})
+
+    assert cache.get("u", ("b",)) is None  # least recently used
+    assert cache.get("u", ("a",)) == {"v": "a"}
+    assert cache.get("other", ("a",)) == {"v": "other"}
+
+    cache.invalidate("other")
+    assert cache.get("u", ("a",)) == {"v": "a"}
+
+
+def test_cache_entries_expire():
+    cache = AnalyticsCache(ttl=-1)
+    cache.set("u", ("k",), {"v": 1})
+    assert cache.get("u", ("k",)) is None
@@ -0,0 +1,105 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import server
+from analytics import AnalyticsCache
+
+HEADERS = {"Authorization": "Bearer mock-token"}
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for the transaction write handlers."""
+
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+
+    def _matches(self, doc, query):
+        return all(doc.get(k) == v for k, v in query.items())
+
+    async def find_one(self, query, projection=None):
+        return next((dict(d) for d in self.docs if self._matches(d, query)), None)
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def update_one(self, query, update):
+        for d in self.docs:
+            if self._matches(d, query):
+                d.update(update["$set"])
+                return
+
+    async def delete_one(self, query):
+        self.docs = [d for d in self.docs if not self._matches(d, query)]
+
+
+class FakeDB:
+    def __init__(self):
+        self.accounts = FakeCollection([{"id": "acc1", "user_id": "mock-user-id", "name": "Main", "balance": 100.0}])
+        self.transactions = FakeCollection()
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    async def fake_fetch(collection, user_id, start_date=None, end_date=None, top_n=10):
+        calls.append({"user_id": user_id, "start_date": start_date, "end_date": end_date, "top_n": top_n})
+        return {"top_merchants": [{"_id": "Coffee", "amount": 3.0, "count": 1}]}
+
+    monkeypatch.delenv("AUTH_MODE", raising=False)
+    monkeypatch.setattr(server, "fetch_spending_facets", fake_fetch)
+    monkeypatch.setattr(server, "analytics_cache", AnalyticsCache())
+    monkeypatch.setattr(server, "db", FakeDB())
+    return calls
+
+
+@pytest.fixture
+def client(calls):
+    # No context manager: lifespan (Mongo startup, price hub) is not started
+    return TestClient(server.app)
+
+
+@pytest.mark.parametrize("query, detail", [
+    ("start_date=2024-02-30", "Dates must be valid YYYY-MM-DD values"),
+    ("end_date=yesterday", "Dates must be valid YYYY-MM-DD values"),
+    ("start_date=2024-05-01&end_date=2024-01-01", "start_date must not be after end_date"),
+])
+def test_invalid_dates_are_rejected(client, calls, query, detail):
+    response = client.get(f"/api/analytics/spending?{query}", headers=HEADERS)
+    assert response.status_code == 400
+    assert response.json() == {"detail": detail}
+    assert calls == []
+
+
+@pytest.mark.parametrize("top, expected", [(0, 1), (-5, 1), (25, 25), (1000, 100)])
+def test_top_is_clamped(client, calls, top, expected):
+    assert client.get(f"/api/analytics/spending?top={top}", headers=HEADERS).status_code == 200
+    assert calls[-1]["top_n"] == expected
+
+
+def test_dates_are_normalized_before_use(client, calls):
+    client.get("/api/analytics/spending?start_date=%202024-01-01%20&end_date=2024-01-31", headers=HEADERS)
+    assert calls[-1]["start_date"] == "2024-01-01"
+    assert calls[-1]["end_date"] == "2024-01-31"
+
+
+def test_report_is_cached_until_a_transaction_is_written(client, calls):
+    first = client.get("/api/analytics/spending", headers=HEADERS)
+    assert first.json()["top_merchants"] == [{"note": "Coffee", "amount": 3.0, "count": 1}]
+    client.get("/api/analytics/spending", headers=HEADERS)
+    assert len(calls) == 1
+
+    created = client.post("/api/transactions", headers=HEADERS, json={
+        "type": "expense", "amount": 5.0, "category": "Food & Dining",
+        "account_id": "acc1", "date": "2024-01-02", "note": "Coffee",
+    })
+    assert created.status_code == 200
+    client.get("/api/analytics/spending", headers=HEADERS)
+    assert len(calls) == 2
+
+    client.get("/api/analytics/spending", headers=HEADERS)
+    assert len(calls) == 2
+    deleted = client.delete(f"/api/transactions/{created.json()['id']}", headers=HEADERS)
+    assert deleted.status_code == 200
+    client.get("/api/analytics/spending", headers=HEADERS)
+    assert len(calls) == 3
@@ -0,0 +1,149 @@
+import asyncio
+
+from price_stream import FakeTickSource, PriceHub, Subscriber
+
+
+class StaticSource:
+    """Returns fixed quotes and records which symbols were requested."""
+
+    def __init__(self, quotes):
+        self.quotes = quotes
+        self.requests = []
+
+    async def fetch(self, symbols):
+        symbols = list(symbols)
+        self.requests.append(sorted(symbols))
+        return {s: dict(self.quotes[s]) for s in symbols if s in self.quotes}
+
+
+def drain(sub):
+    return asyncio.run(asyncio.wait_for(sub.next_batch(), timeout=1))
+
+
+def test_each_symbol_polled_once_per_tick_regardless_of_subscribers():
+    source = StaticSource({"BTC-USD": {"price": 1.0, "change_24h": 0.0}})
+    hub = PriceHub(source)
+    subs = [Subscriber() for _ in range(3)]
+    for sub in subs:
+        hub.subscribe(sub, ["BTC-USD"])
+
+    assert asyncio.run(hub.tick()) == 3
+    assert source.requests == [["BTC-USD"]]
+
+
+def test_unchanged_quotes_are_not_pushed_again():
+    source = StaticSource({"AAPL": {"price": 10.0, "change_24h": 1.0}})
+    hub = PriceHub(source)
+    sub = Subscriber()
+    hub.subscribe(sub, ["AAPL"])
+
+    assert asyncio.run(hub.tick()) == 1
+    assert [u["price"] for u in drain(sub)] == [10.0]
+    assert asyncio.run(hub.tick()) == 0
+
+    source.quotes["AAPL"]["price"] = 11.0
+    assert asyncio.run(hub.tick()) == 1
+    assert [u["price"] for u in drain(sub)] == [11.0]
+
+
+def test_new_subscriber_gets_last_known_price():
+    source = StaticSource({"AAPL": {"price": 10.0, "change_24h": 1.0}})
+    hub = PriceHub(source)
+    hub.subscribe(Subscriber(), ["AAPL"])
+    asyncio.run(hub.tick())
+
+    late = Subscriber()
+    hub.subscribe(late, ["AAPL"])
+    assert [u["price"] for u in drain(late)] == [10.0]
+
+
+def test_slow_subscriber_updates_are_coalesced_per_symbol():
+    sub = Subscriber()
+    for price in (1.0, 2.0, 3.0):
+        sub.push({"symbol": "ETH-USD", "price": price})
+    sub.push({"symbol": "SOL-USD", "price": 5.0})
+
+    batch = drain(sub)
+    assert {u["symbol"]: u["price"] for u in batch} == {"ETH-USD": 3.0, "SOL-USD": 5.0}
+    assert sub.dropped == 2
+
+
+def test_unsubscribe_all_stops_polling_symbols_without_listeners():
+    source = StaticSource({"A": {"price": 1.0, "change_24h": 0.0}, "B": {"price": 2.0, "change_24h": 0.0}})
+    hub = PriceHub(source)
+    first, second = Subscriber(), Subscriber()
+    hub.subscribe(first, ["A", "B"])
+    hub.subscribe(second, ["B"])
+
+    hub.unsubscribe_all(first)
+    assert first.symbols == set()
+    assert hub.stats()["symbols"] == 1
+
+    asyncio.run(hub.tick())
+    assert source.requests == [["B"]]
+
+    hub.unsubscribe_all(second)
+    assert hub.stats() == {"symbols": 0, "subscriptions": 0, "running": False}
+    assert asyncio.run(hub.tick()) == 0
+    assert len(source.requests) == 1
+
+
+def test_subscription_limit_per_subscriber():
+    hub = PriceHub(FakeTickSource(), max_symbols_per_subscriber=2)
+    sub = Subscriber()
+    assert hub.subscribe(sub, ["A", "B", "C"]) == ["A", "B"]
+    assert hub.subscribe(sub, ["A"]) == []
+
+
+def test_fake_source_is_deterministic():
+    a, b = FakeTickSource(seed=1), FakeTickSource(seed=1)
+    for _ in range(5):
+        assert asyncio.run(a.fetch(["X", "Y"])) == asyncio.run(b.fetch(["X", "Y"]))
+
+
+def test_hub_wide_symbol_cap_refuses_new_symbols():
+    hub = PriceHub(FakeTickSource(), max_symbols=2)
+    first, second = Subscriber(), Subscriber()
+    assert hub.subscribe(first, ["A", "B"]) == ["A", "B"]
+    assert hub.subscribe(second, ["B", "C"]) == ["B"]  # B is already polled, C would be a third
+
+    hub.unsubscribe_all(first)
+    assert hub.subscribe(second, ["C"]) == ["C"]
+
+
+def test_symbols_without_data_are_evicted_and_reported():
+    source = StaticSource({"GOOD": {"price": 1.0, "change_24h": 0.0}})
+    hub = PriceHub(source, max_misses=2)
+    sub = Subscriber()
+    hub.subscribe(sub, ["GOOD", "NOPE"])
+
+    asyncio.run(hub.tick())
+    drain(sub)
+    assert "NOPE" in sub.symbols
+
+    asyncio.run(hub.tick())
+    assert [u for u in drain(sub) if u.get("status") == "unavailable"][0]["symbol"] == "NOPE"
+    assert sub.symbols == {"GOOD"}
+    assert hub.stats()["symbols"] == 1
+
+
+def test_empty_batch_is_treated_as_outage_not_bad_symbols():
+    hub = PriceHub(StaticSource({}), max_misses=1)
+    hub.subscribe(Subscriber(), ["A", "B"])
+    asyncio.run(hub.tick())
+    assert hub.stats()["symbols"] == 2
+
+
+def test_yfinance_batch_frame_is_split_per_ticker():
+    import numpy as np
+    import pandas as pd
+    from price_stream import YFinanceTickSource
+
+    columns = pd.MultiIndex.from_product([["AAPL", "BAD"], ["Open", "Close"]])
+    frame = pd.DataFrame(np.nan, index=pd.date_range("2024-01-01", periods=2), columns=columns)
+    frame[("AAPL", "Open")] = [1.0, 4.0]
+    frame[("AAPL", "Close")] = [2.0, 5.0]
+
+    quotes = YFinanceTickSource._quotes_from_frame(frame, ["AAPL", "BAD", "MISSING"])
+    assert quotes == {"AAPL": {"price": 5.0, "change_24h": 25.0}}
+    assert YFinanceTickSource._quotes_from_frame(frame["AAPL"], ["AAPL"]) == quotes
@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import server
+from price_stream import FakeTickSource, PriceHub
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.delenv("AUTH_MODE", raising=False)
+    monkeypatch.setattr(server, "price_hub", PriceHub(FakeTickSource()))
+    # No context manager: lifespan (Mongo startup, hub polling loop) is not started
+    return TestClient(server.app)
+
+
+def auth(ws, token="mock-token", symbols=("btc", "AAPL")):
+    ws.send_json({"action": "auth", "token": token, "symbols": list(symbols)})
+    return ws.receive_json()
+
+
+def test_auth_message_subscribes_initial_symbols(client):
+    with client.websocket_connect("/api/prices/stream") as ws:
+        reply = auth(ws, symbols=["btc", "AAPL", "not a ticker!"])
+        assert reply == {"type": "authenticated", "symbols": ["BTC-USD", "AAPL"], "rejected": ["NOT A TICKER!"]}
+        assert server.price_hub.stats()["symbols"] == 2
+
+
+@pytest.mark.parametrize("first_frame", [
+    {"action": "auth", "token": "garbage"},
+    {"action": "subscribe", "symbols": ["BTC"]},
+])
+def test_bad_or_missing_auth_closes_with_1008(client, first_frame):
+    with client.websocket_connect("/api/prices/stream") as ws:
+        ws.send_json(first_frame)
+        with pytest.raises(WebSocketDisconnect) as exc:
+            ws.receive_json()
+    assert exc.value.code == 1008
+    assert server.price_hub.stats()["symbols"] == 0
+
+
+def test_non_json_frame_gets_error_and_stream_continues(client):
+    with client.websocket_connect("/api/prices/stream") as ws:
+        auth(ws)
+        ws.send_text("not json{")
+        assert ws.receive_json() == {"type": "error", "detail": "Messages must be JSON objects"}
+        ws.send_json({"action": "subscribe", "symbols": ["ETH"]})
+        assert ws.receive_json() == {"type": "subscribed", "symbols": ["ETH-USD"], "rejected": []}
+
+
+def test_subscriptions_are_released_when_socket_closes(client):
+    with client.websocket_connect("/api/prices/stream") as ws:
+        auth(ws)
+        ws.send_json({"action": "subscribe", "symbols": ["ETH"]})
+        ws.receive_json()
+        assert server.price_hub.stats()["subscriptions"] == 3
+    assert server.price_hub.stats() == {"symbols": 0, "subscriptions": 0, "running": False}